@@ -0,0 +1,159 @@
+import math
+import random
+from statistics import NormalDist
+from typing import NamedTuple
+
+from event_query import StatCorpus
+from event_filters import QueryPlan, compileQuery
+
+class Estimate(NamedTuple):
+    # Approximate answer with a confidence interval
+    estimate: float
+    lower: float
+    upper: float
+    confidence: float
+    games_sampled: int
+    games_total: int
+
+STRATA_PERIODS = ['month', 'quarter', 'year', 'all']
+
+def _period(date, period):
+    if period == 'month':
+        return date.strftime('%Y-%m')
+    if period == 'quarter':
+        return f'{date.year}-Q{(date.month - 1) // 3 + 1}'
+    if period == 'year':
+        return str(date.year)
+    return 'all'
+
+def stratifyGames(corpus: StatCorpus, period='month'):
+    # groups games by the period they were played in, as play styles and
+    # Rio versions change over time, so each period is represented in a sample
+    if period not in STRATA_PERIODS:
+        raise Exception(f'Invalid period {period}. Accepted periods: {STRATA_PERIODS}')
+    strata: dict[str, list[str]] = {}
+    for game_key in corpus.gameKeysByDate():
+        strata.setdefault(_period(corpus.gameDate(game_key), period), []).append(game_key)
+    return strata
+
+def sampleGames(corpus: StatCorpus, sample_size, seed=None):
+    # returns the strata and a dict of stratum: sampled game keys, sample_size
+    # games in total, allocated proportionally to the size of each stratum
+    # at least two games are taken per stratum (when available) to estimate its variance,
+    # so strata are merged from months into quarters, years or the whole corpus
+    # until that floor fits within sample_size
+    if sample_size < 2:
+        raise Exception(f'Invalid sample size {sample_size}. At least two games are needed to estimate the variance.')
+
+    rng = random.Random(seed)
+    for period in STRATA_PERIODS:
+        strata = stratifyGames(corpus, period)
+        if sum(min(2, len(games)) for games in strata.values()) <= sample_size:
+            break
+    allocations = _allocate(strata, sample_size)
+
+    # an empty corpus has nothing to sample, every estimate is then exactly zero
+    sample = {stratum: rng.sample(games, allocations[stratum]) for stratum, games in strata.items()}
+    return strata, sample
+
+def _allocate(strata, sample_size):
+    # returns a dict of stratum: number of games to sample, totalling sample_size
+    # (or every game in a smaller corpus), with at least two games per stratum and
+    # the rest shared in proportion to the games each stratum has left
+    allocations = {stratum: min(2, len(games)) for stratum, games in strata.items()}
+    spare = {stratum: len(games) - allocations[stratum] for stratum, games in strata.items()}
+    total_spare = sum(spare.values())
+    remaining = min(sample_size - sum(allocations.values()), total_spare)
+    if remaining <= 0:
+        return allocations
+
+    shares = {stratum: remaining * spare[stratum] / total_spare for stratum in strata}
+    for stratum in strata:
+        allocations[stratum] += int(shares[stratum])
+    leftover = remaining - sum(int(share) for share in shares.values())
+    for stratum in sorted(strata, key=lambda stratum: shares[stratum] - int(shares[stratum]), reverse=True)[:leftover]:
+        allocations[stratum] += 1
+    return allocations
+
+def _plan(spec):
+    return spec if isinstance(spec, QueryPlan) else compileQuery(spec)
+
+def _stratifiedTotal(strata, values):
+    # returns the stratified estimate of a corpus total and its variance
+    # values is a dict of stratum: list of per game values
+    total = 0.0
+    variance = 0.0
+    for stratum, stratum_values in values.items():
+        population = len(strata[stratum])
+        sampled = len(stratum_values)
+        mean = sum(stratum_values) / sampled
+        total += population * mean
+        if sampled > 1:
+            sample_variance = sum((value - mean) ** 2 for value in stratum_values) / (sampled - 1)
+            variance += population ** 2 * (1 - sampled / population) * sample_variance / sampled
+    return total, variance
+
+def _zScore(confidence):
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+def estimateCount(corpus: StatCorpus, spec, sample_size=30, seed=None, confidence=0.95):
+    # estimates the number of events in the corpus matching the spec
+    # from a stratified sample of games instead of a full scan
+    plan = _plan(spec)
+    strata, sample = sampleGames(corpus, sample_size, seed)
+
+    counts = {stratum: [len(plan.matchingEvents(corpus.eventSearch(game_key))) for game_key in games]
+              for stratum, games in sample.items()}
+    total, variance = _stratifiedTotal(strata, counts)
+    margin = _zScore(confidence) * math.sqrt(variance)
+
+    return Estimate(estimate=total,
+                    lower=max(0.0, total - margin),
+                    upper=total + margin,
+                    confidence=confidence,
+                    games_sampled=sum(len(games) for games in sample.values()),
+                    games_total=len(corpus))
+
+def estimateFraction(corpus: StatCorpus, spec, given, sample_size=30, seed=None, confidence=0.95):
+    # estimates the fraction of events matching given that also match spec,
+    # e.g. spec={'hr': True}, given={'contactType': ['perfect'], 'frame': [5]}
+    # spec and given are filter dicts or QueryPlans and may not share a filter,
+    # so the matching events stay a subset of given
+    # uses a stratified ratio estimator with a linearized variance
+    spec_plan = _plan(spec)
+    given_plan = _plan(given)
+    shared_filters = spec_plan.inputs.keys() & given_plan.inputs.keys()
+    if shared_filters:
+        raise Exception(f'Filters {sorted(shared_filters)} appear in both spec and given. Put each filter in only one of them.')
+    both_plan = QueryPlan(given_plan.filters + spec_plan.filters)
+    strata, sample = sampleGames(corpus, sample_size, seed)
+
+    given_counts = {}
+    both_counts = {}
+    for stratum, games in sample.items():
+        given_counts[stratum] = []
+        both_counts[stratum] = []
+        for game_key in games:
+            events_search = corpus.eventSearch(game_key)
+            given_counts[stratum].append(len(given_plan.matchingEvents(events_search)))
+            both_counts[stratum].append(len(both_plan.matchingEvents(events_search)))
+
+    given_total, _ = _stratifiedTotal(strata, given_counts)
+    both_total, _ = _stratifiedTotal(strata, both_counts)
+    games_sampled = sum(len(games) for games in sample.values())
+    if given_total == 0:
+        # no events matching given were sampled, so nothing is known about the fraction
+        return Estimate(math.nan, 0.0, 1.0, confidence, games_sampled, len(corpus))
+
+    ratio = both_total / given_total
+    residuals = {stratum: [both - ratio * given for both, given in zip(both_counts[stratum], given_counts[stratum])]
+                 for stratum in sample}
+    _, residual_variance = _stratifiedTotal(strata, residuals)
+    margin = _zScore(confidence) * math.sqrt(residual_variance) / given_total
+
+    return Estimate(estimate=ratio,
+                    lower=max(0.0, ratio - margin),
+                    upper=min(1.0, ratio + margin),
+                    confidence=confidence,
+                    games_sampled=games_sampled,
+                    games_total=len(corpus))
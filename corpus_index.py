@@ -0,0 +1,253 @@
+import json
+import os
+import pickle
+import sys
+
+from project_rio_lib import stat_file_parser
+from project_rio_lib.stat_file_parser import StatObj
+from project_rio_lib.lookup import LookupDicts
+import event_search_class
+from event_search_class import EventSearch
+from event_search_cache import sourceVersion
+import CharacterInputHandling as CHI
+
+WALKOFF_RESULT = 'Walkoff'
+
+# bump when the saved index layout changes, saved indexes are also invalidated
+# whenever the source of this module, EventSearch or the stat file parser changes
+INDEX_FORMAT = 1
+INDEX_VERSION = sourceVersion([sys.modules[__name__], event_search_class, stat_file_parser], INDEX_FORMAT)
+
+def statFilePaths(directory):
+    # returns the paths of the decoded stat files in the directory
+    # crash and quit files are skipped as they do not describe a full game
+    paths = []
+    for filename in os.listdir(directory):
+        stat_file = os.path.join(directory, filename)
+        if (os.path.isfile(stat_file)) & (filename != ".DS_Store") & ('decoded' in filename):
+            paths.append(stat_file)
+    return paths
+
+class CorpusIndex():
+    # Materialized views over every indexed game so that questions like
+    # "all of Mario's HRs" are answered without rescanning each EventSearch.
+    # Events are identified across the corpus by (game_key, eventNum) pairs.
+    def __init__(self):
+        self._indexed_games: set[str] = set()
+
+        self._character_result_dict: dict[str, dict[str, set[tuple[str, int]]]] = {}
+        self._pitcher_result_dict: dict[str, dict[str, set[tuple[str, int]]]] = {}
+        self._player_result_dict: dict[str, dict[str, set[tuple[str, int]]]] = {}
+        self._inning_dict: dict[int, set[tuple[str, int]]] = {}
+
+        # composite matchup views keyed by character pair, then by Rio user pair
+        # (batting player, pitching player) or (batting player, fielding player)
+        self._batter_pitcher_dict: dict[tuple[str, str], dict[tuple[str, str], set[tuple[str, int]]]] = {}
+        self._batter_fielder_dict: dict[tuple[str, str], dict[tuple[str, str], set[tuple[str, int]]]] = {}
+        self._batter_pitcher_games: dict[tuple[str, str], set[str]] = {}
+        self._batter_fielder_games: dict[tuple[str, str], set[str]] = {}
+
+    def __contains__(self, game_key):
+        return game_key in self._indexed_games
+
+    def gamesIndexed(self):
+        return len(self._indexed_games)
+
+    def indexedGames(self):
+        return set(self._indexed_games)
+
+    def save(self, path):
+        # written beside the final path then moved so a partial index is never read
+        with open(f'{path}.tmp', "wb") as index_file:
+            pickle.dump(self, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+
+    def addGame(self, game_key: str, events_search: EventSearch):
+        # adds a single game to every view
+        # returns False without changing the views if the game was already indexed
+        if game_key in self._indexed_games:
+            return False
+        self._indexed_games.add(game_key)
+
+        rioStat = events_search.rioStat
+
+        batter_of_event: dict[int, str] = {}
+        pitcher_of_event: dict[int, str] = {}
+        for char_id, actions in events_search.character_action_dict.items():
+            for eventNum in actions['AtBat']:
+                batter_of_event[eventNum] = char_id
+            for eventNum in actions['Pitching']:
+                pitcher_of_event[eventNum] = char_id
+
+        batting_player_of_half = {0: rioStat.player(0).lower(), 1: rioStat.player(1).lower()}
+        half_of_event: dict[int, int] = {}
+        for half, events in events_search._half_inning_dict.items():
+            for eventNum in events:
+                half_of_event[eventNum] = half
+
+        for eventNum, batter in batter_of_event.items():
+            half = half_of_event[eventNum]
+            players = (batting_player_of_half[half], batting_player_of_half[abs(half-1)])
+            pair = (batter, pitcher_of_event[eventNum])
+            self.__addToView(self._batter_pitcher_dict, pair, players, (game_key, eventNum))
+            self._batter_pitcher_games.setdefault(pair, set()).add(game_key)
+
+        for char_id, actions in events_search.character_action_dict.items():
+            for eventNum in actions['Fielding']:
+                half = half_of_event[eventNum]
+                players = (batting_player_of_half[half], batting_player_of_half[abs(half-1)])
+                pair = (batter_of_event[eventNum], char_id)
+                self.__addToView(self._batter_fielder_dict, pair, players, (game_key, eventNum))
+                self._batter_fielder_games.setdefault(pair, set()).add(game_key)
+
+        for inning, events in events_search._inning_dict.items():
+            inning_events = self._inning_dict.setdefault(inning, set())
+            inning_events.update((game_key, eventNum) for eventNum in events)
+
+        results = list(events_search._result_of_AB_dict.items())
+        results.append((WALKOFF_RESULT, events_search.walkoffEvents()))
+
+        for result, events in results:
+            for eventNum in events:
+                key = (game_key, eventNum)
+                self.__addToView(self._character_result_dict, batter_of_event[eventNum], result, key)
+                self.__addToView(self._pitcher_result_dict, pitcher_of_event[eventNum], result, key)
+                self.__addToView(self._player_result_dict, batting_player_of_half[half_of_event[eventNum]], result, key)
+
+        return True
+
+    def __addToView(self, view, view_key, result, event_key):
+        view.setdefault(view_key, {}).setdefault(result, set()).add(event_key)
+
+    def __viewLookup(self, view, view_key, result):
+        # returns an empty set rather than raising an error when the
+        # key or result never appeared in the indexed games
+        if view_key not in view:
+            return set()
+        return view[view_key].get(result, set())
+
+    def __resultName(self, result):
+        # resolves a result name case insensitively, e.g. 'hr' or 'caught line-drive'
+        # raises an error for names that are not at bat results
+        accepted = list(LookupDicts.FINAL_RESULT.values()) + [WALKOFF_RESULT]
+        for name in accepted:
+            if result.lower() == name.lower():
+                return name
+        raise Exception(f'Invalid result {result}. Accepted results: {accepted}')
+
+    def characterResultEvents(self, character, result):
+        # returns a set of (game_key, eventNum) where the input character batted
+        # and the at bat ended with the input result
+        char_id = CHI.userInputToCharacter(character)
+        return self.__viewLookup(self._character_result_dict, char_id, self.__resultName(result))
+
+    def pitcherResultEvents(self, character, result):
+        # returns a set of (game_key, eventNum) where the input character pitched
+        # and the at bat ended with the input result
+        char_id = CHI.userInputToCharacter(character)
+        return self.__viewLookup(self._pitcher_result_dict, char_id, self.__resultName(result))
+
+    def playerResultEvents(self, player, result):
+        # returns a set of (game_key, eventNum) where the input Rio user was batting
+        # and the at bat ended with the input result
+        return self.__viewLookup(self._player_result_dict, player.lower(), self.__resultName(result))
+
+    def inningEvents(self, inning):
+        return self._inning_dict.get(inning, set())
+
+    def byInning(self, events):
+        # splits a set of (game_key, eventNum) into a dict keyed by inning
+        # e.g. byInning(pitcherResultEvents('boo', 'Strikeout'))
+        result = {}
+        for inning in sorted(self._inning_dict.keys()):
+            inning_events = events & self._inning_dict[inning]
+            if inning_events:
+                result[inning] = inning_events
+        return result
+
+    def characterResultCounts(self, character):
+        # returns a dict of result: count for every at bat of the input character
+        char_id = CHI.userInputToCharacter(character)
+        return {result: len(events) for result, events in self._character_result_dict.get(char_id, {}).items()}
+
+    def pitcherResultCounts(self, character):
+        # returns a dict of result: count for every at bat the input character pitched
+        char_id = CHI.userInputToCharacter(character)
+        return {result: len(events) for result, events in self._pitcher_result_dict.get(char_id, {}).items()}
+
+    def playerResultCounts(self, player):
+        # returns a dict of result: count for every at bat of the input Rio user
+        return {result: len(events) for result, events in self._player_result_dict.get(player.lower(), {}).items()}
+
+    def __matchupLookup(self, view, pair, batting_player, opposing_player):
+        # unions the events of every Rio user pair matching the optional players
+        result = set()
+        for (batting, opposing), events in view.get(pair, {}).items():
+            if batting_player is not None and batting != batting_player.lower():
+                continue
+            if opposing_player is not None and opposing != opposing_player.lower():
+                continue
+            result = result.union(events)
+        return result
+
+    def batterPitcherEvents(self, batter, pitcher, batting_player=None, pitching_player=None):
+        # returns a set of (game_key, eventNum) where the batter faced the pitcher
+        # optionally limited to the Rio users controlling each team
+        pair = (CHI.userInputToCharacter(batter), CHI.userInputToCharacter(pitcher))
+        return self.__matchupLookup(self._batter_pitcher_dict, pair, batting_player, pitching_player)
+
+    def batterFielderEvents(self, batter, fielder, batting_player=None, fielding_player=None):
+        # returns a set of (game_key, eventNum) where the fielder was first to field the batter's ball
+        # optionally limited to the Rio users controlling each team
+        pair = (CHI.userInputToCharacter(batter), CHI.userInputToCharacter(fielder))
+        return self.__matchupLookup(self._batter_fielder_dict, pair, batting_player, fielding_player)
+
+    def matchupGames(self, batter_id, pitcher_id=None, fielder_id=None):
+        # returns the set of game keys where every given matchup happened at least once
+        # takes CharIDs, as already resolved in a QueryPlan, rather than user input
+        games = None
+        if pitcher_id is not None:
+            games = self._batter_pitcher_games.get((batter_id, pitcher_id), set())
+        if fielder_id is not None:
+            fielder_games = self._batter_fielder_games.get((batter_id, fielder_id), set())
+            games = fielder_games if games is None else games & fielder_games
+        return games
+
+    def matchupPlayers(self, batter, pitcher):
+        # returns a dict of (batting player, pitching player): number of events for the matchup
+        pair = (CHI.userInputToCharacter(batter), CHI.userInputToCharacter(pitcher))
+        return {players: len(events) for players, events in self._batter_pitcher_dict.get(pair, {}).items()}
+
+    def matchupSummary(self, batter, pitcher, batting_player=None, pitching_player=None):
+        # returns a dict of result: count for the head to head between the batter and pitcher
+        # 'Pitches' counts every event of the matchup and 'Plate Appearances'
+        # every at bat that ended with a result
+        matchup_events = self.batterPitcherEvents(batter, pitcher, batting_player, pitching_player)
+        summary = {'Pitches': len(matchup_events), 'Plate Appearances': 0}
+        for result, events in self._character_result_dict.get(CHI.userInputToCharacter(batter), {}).items():
+            if result == 'None':
+                continue
+            count = len(matchup_events & events)
+            if not count:
+                continue
+            summary[result] = count
+            if result != WALKOFF_RESULT:
+                summary['Plate Appearances'] += count
+        return summary
+
+def indexPath(directory):
+    # the version is part of the name so indexes saved by older code are never loaded
+    return os.path.join(directory, f'corpus_index.{INDEX_VERSION}.pickle')
+
+def loadCorpusIndex(path):
+    with open(path, "rb") as index_file:
+        return pickle.load(index_file)
+
+def buildCorpusIndex(directory):
+    # indexes every decoded stat file in the directory
+    corpus_index = CorpusIndex()
+    for stat_file in statFilePaths(directory):
+        with open(stat_file, "r") as stats:
+            game_stats = StatObj(json.load(stats))
+        corpus_index.addGame(os.path.basename(stat_file), EventSearch(game_stats))
+    return corpus_index
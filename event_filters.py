@@ -0,0 +1,165 @@
+from typing import Callable, NamedTuple
+
+from project_rio_lib.lookup import LookupDicts
+from event_search_class import EventSearch
+import CharacterInputHandling as CHI
+
+SWING_TYPES = ['none', 'slap', 'charge', 'star', 'bunt']
+CONTACT_TYPES = ['sour', 'nice', 'perfect']
+
+class EventFilter(NamedTuple):
+    # A single search filter
+    # flags take no input, parameters are parsed with arg_type and nargs
+    # validator checks the input and returns the value passed to the accessor
+    # accessor returns the set of matching events from an EventSearch
+    name: str
+    accessor: Callable
+    is_flag: bool = False
+    arg_type: Callable = None
+    nargs: str = None
+    validator: Callable = None
+
+def _flag(name, accessor):
+    return EventFilter(name, lambda events_search, _: accessor(events_search), is_flag=True)
+
+def _character(userInput):
+    return CHI.userInputToCharacter(userInput)
+
+def _fielderPosition(fielderPos):
+    if fielderPos.upper() not in LookupDicts.POSITION.values():
+        raise Exception(f"Invalid fielder position {fielderPos}. Accepted positions: {list(LookupDicts.POSITION.values())}")
+    return fielderPos.upper()
+
+def _halfInning(halfInningNum):
+    if halfInningNum not in [0, 1]:
+        raise Exception(f'Invalid Half Inning num {halfInningNum}. Only 0 or 1 are accepted.')
+    return halfInningNum
+
+def _outsInInning(outsNum):
+    if abs(outsNum) not in [0, 1, 2]:
+        raise Exception(f'Invalid outs num {outsNum}. Only outs of -2 to 2 are accepted.')
+    return outsNum
+
+def _runnersOnBase(baseNums):
+    if len(baseNums) > 3:
+        raise Exception('Too many baseNums provided. runnersOnBase accepts at most 3 bases')
+    for num in baseNums:
+        if abs(num) not in [0, 1, 2, 3]:
+            raise Exception(f'Invalid base num {num}. Only base numbers of -3 to 3 are accepted.')
+    return list(baseNums)
+
+def _acceptedValues(accepted):
+    def validator(inputs):
+        inputList = inputs if isinstance(inputs, (list, set)) else [inputs]
+        for value in inputList:
+            if value.lower() not in accepted:
+                raise Exception(f'{value} is not a valid input. Accepted inputs: {accepted}')
+        return inputs
+    return validator
+
+def _listInput(inputs):
+    # inning style parameters accept a single number or a list of numbers
+    return list(inputs) if isinstance(inputs, (list, set, tuple)) else [inputs]
+
+FILTERS = [
+    _flag('bunt', EventSearch.buntResultEvents),
+    _flag('sacFly', EventSearch.sacFlyResultEvents),
+    _flag('strikeout', EventSearch.strikeoutResultEvents),
+    _flag('groundBallDP', EventSearch.groundBallDoublePlayResultEvents),
+    _flag('errorChem', EventSearch.chemErrorResultEvents),
+    _flag('errorInput', EventSearch.inputErrorResultEvents),
+    _flag('walk', EventSearch.walkResultEvents),
+    _flag('walkHBP', lambda events_search: events_search.walkResultEvents(include_bb=False)),
+    _flag('walkBB', lambda events_search: events_search.walkResultEvents(include_hbp=False)),
+    _flag('hit', EventSearch.hitResultEvents),
+    _flag('single', lambda events_search: events_search.hitResultEvents(numberOfBases=1)),
+    _flag('double', lambda events_search: events_search.hitResultEvents(numberOfBases=2)),
+    _flag('triple', lambda events_search: events_search.hitResultEvents(numberOfBases=3)),
+    _flag('hr', lambda events_search: events_search.hitResultEvents(numberOfBases=4)),
+    _flag('steal', EventSearch.stealEvents),
+    _flag('starPitch', EventSearch.starPitchEvents),
+    _flag('bobble', EventSearch.bobbleEvents),
+    _flag('fiveStarDinger', EventSearch.fiveStarDingerEvents),
+    _flag('slidingCatch', EventSearch.slidingCatchEvents),
+    _flag('wallJump', EventSearch.wallJumpEvents),
+    _flag('manualSelect', EventSearch.manualCharacterSelectionEvents),
+    _flag('walkoff', EventSearch.walkoffEvents),
+    _flag('caught', EventSearch.caughtResultEvents),
+    _flag('caughtLineDrive', EventSearch.caughtLineDriveResultsEvents),
+    _flag('out', EventSearch.outResultEvents),
+
+    EventFilter('firstFielderPos', EventSearch.positionFieldingEvents, validator=_fielderPosition),
+    EventFilter('batter', EventSearch.characterAtBatEvents, validator=_character),
+    EventFilter('pitcher', EventSearch.characterPitchingEvents, validator=_character),
+    EventFilter('fielder', EventSearch.characterFieldingEvents, validator=_character),
+    EventFilter('battingPlayer', EventSearch.playerBattingEvents),
+    EventFilter('pitchingPlayer', EventSearch.playerPitchingEvents),
+    EventFilter('inning', EventSearch.inningEvents, arg_type=int, nargs='+', validator=_listInput),
+    EventFilter('chemOnBase', EventSearch.chemOnBaseEvents, arg_type=int, nargs='+', validator=_listInput),
+    EventFilter('halfInning', EventSearch.halfInningEvents, arg_type=int, validator=_halfInning),
+    EventFilter('outsInInning', EventSearch.outsInInningEvents, arg_type=int, validator=_outsInInning),
+    EventFilter('balls', EventSearch.ballEvents, arg_type=int, nargs='+', validator=_listInput),
+    EventFilter('strikes', EventSearch.strikeEvents, arg_type=int, nargs='+', validator=_listInput),
+    EventFilter('rbi', EventSearch.rbiEvents, arg_type=int, nargs='+', validator=_listInput),
+    EventFilter('swingType', EventSearch.swingTypeEvents, validator=_acceptedValues(SWING_TYPES)),
+    EventFilter('ballStrikezonePos', EventSearch.ballPositionStrikezoneEvents, arg_type=float),
+    EventFilter('ballContactPos', EventSearch.ballContactPositionEvents, arg_type=float),
+    EventFilter('frame', EventSearch.contactFrameEvents, arg_type=int, nargs='+', validator=_listInput),
+    EventFilter('contactType', EventSearch.contactTypeEvents, nargs='+', validator=_acceptedValues(CONTACT_TYPES)),
+    EventFilter('runnersOnBase', EventSearch.runnerOnBaseEvents, arg_type=int, nargs='+', validator=_runnersOnBase),
+    ]
+
+EVENT_FILTERS: dict[str, EventFilter] = {event_filter.name: event_filter for event_filter in FILTERS}
+
+def addFilterArguments(parser):
+    # adds a command line argument for every registered filter
+    for event_filter in FILTERS:
+        if event_filter.is_flag:
+            parser.add_argument(f'--{event_filter.name}', action='store_true')
+        else:
+            parser.add_argument(f'--{event_filter.name}', type=event_filter.arg_type, nargs=event_filter.nargs)
+
+class QueryPlan():
+    # A filter spec validated once, applied to any number of games
+    def __init__(self, filters: list):
+        # filters is a list of (EventFilter, validated input)
+        self.filters = filters
+        self.inputs: dict = {event_filter.name: input for event_filter, input in filters}
+
+    def summary(self):
+        # returns a readable list describing the filters in the plan
+        event_summary = []
+        for event_filter, input in self.filters:
+            if event_filter.is_flag:
+                event_summary.append(event_filter.name)
+            else:
+                event_summary.append(f'{event_filter.name}: {input}')
+        return event_summary
+
+    def matchingEvents(self, events_search: EventSearch):
+        # returns the set of events in a single game matching every filter
+        matching = set(range(events_search.rioStat.final_event()+1))
+        for event_filter, input in self.filters:
+            matching = matching.intersection(event_filter.accessor(events_search, input))
+            if not matching:
+                break
+        return matching
+
+def compileQuery(spec: dict):
+    # validates a filter spec and returns a QueryPlan
+    # flags take True, parameters take the same inputs as the command line
+    # unset entries (None or False), e.g. the defaults from argparse, are ignored
+    filters = []
+    for name, input in spec.items():
+        if input is None or input is False:
+            continue
+        if name not in EVENT_FILTERS:
+            raise Exception(f'Invalid filter {name}. Accepted filters: {list(EVENT_FILTERS.keys())}')
+        event_filter = EVENT_FILTERS[name]
+        if event_filter.is_flag:
+            if input is not True:
+                raise Exception(f'{name} is a flag and only accepts True')
+        elif event_filter.validator is not None:
+            input = event_filter.validator(input)
+        filters.append((event_filter, input))
+    return QueryPlan(filters)
@@ -0,0 +1,203 @@
+import heapq
+import os
+import re
+from datetime import datetime
+from typing import NamedTuple
+
+from project_rio_lib.stat_file_parser import EventObj
+from event_search_cache import EventSearchCache
+from corpus_index import CorpusIndex, indexPath, loadCorpusIndex, statFilePaths
+from event_filters import QueryPlan, compileQuery
+
+ORDER_BY = ['date', 'event']
+
+# stat files are named <type>.<YYYYMMDD>T<HHMMSS>_<away>-Vs-<home>_<gameID>.json
+FILENAME_TIMESTAMP = re.compile(r'\.(\d{8}T\d{6})_')
+
+class EventMatch(NamedTuple):
+    # Lightweight record of a single event matching a query
+    game_key: str
+    event_num: int
+    away_player: str
+    home_player: str
+    video_published: str
+    game_date: datetime
+    batter: str
+    pitcher: str
+    half_inning: int
+    inning: int
+    outs: int
+    balls: int
+    strikes: int
+
+class StatCorpus():
+    # Holds every decoded stat file in a directory so that the corpus
+    # can be shared across any number of queries
+    # Games are parsed on first use and kept in an EventSearchCache,
+    # memory_budget (bytes) bounds how many stay resident at once
+    def __init__(self, directory, memory_budget=None, snapshot_directory=None):
+        self.directory = directory
+        self._stat_files: dict[str, str] = {os.path.basename(stat_file): stat_file for stat_file in statFilePaths(directory)}
+        self.cache = EventSearchCache(self._stat_files, memory_budget, snapshot_directory)
+        self._game_dates: dict[str, datetime] = {}
+        self.index = None
+
+    def __len__(self):
+        return len(self._stat_files)
+
+    def gameKeys(self):
+        return list(self._stat_files.keys())
+
+    def gameDate(self, game_key):
+        # returns the start time of the game, read from the file name when possible
+        # so that ordering the corpus does not require parsing every game
+        if game_key not in self._game_dates:
+            timestamp = FILENAME_TIMESTAMP.search(game_key)
+            if timestamp:
+                self._game_dates[game_key] = datetime.strptime(timestamp.group(1), '%Y%m%dT%H%M%S')
+            else:
+                date_start = self.eventSearch(game_key).rioStat.statJson['Date - Start']
+                self._game_dates[game_key] = datetime.strptime(date_start, '%a %b %d %H:%M:%S %Y')
+        return self._game_dates[game_key]
+
+    def gameKeysByDate(self, descending=False):
+        return sorted(self._stat_files.keys(), key=lambda game_key: (self.gameDate(game_key), game_key), reverse=descending)
+
+    def eventSearch(self, game_key):
+        return self.cache.get(game_key)
+
+    def buildIndex(self):
+        # indexes every game into a CorpusIndex, later searches use its
+        # matchup views to skip games where the matchup never happened
+        # with a snapshot directory the index is saved there and loaded on later
+        # runs, only games added since are read, and any stat file changed or
+        # removed since the index was saved causes a full rebuild
+        snapshot_directory = self.cache.snapshot_directory
+        index = None
+        if snapshot_directory is not None:
+            index_path = indexPath(snapshot_directory)
+            if os.path.isfile(index_path):
+                index_time = os.path.getmtime(index_path)
+                index = loadCorpusIndex(index_path)
+                stale = any(os.path.getmtime(self._stat_files[game_key]) > index_time for game_key in index.indexedGames() if game_key in self._stat_files)
+                if stale or not index.indexedGames().issubset(self._stat_files.keys()):
+                    index = None
+
+        loaded_games = 0 if index is None else index.gamesIndexed()
+        if index is None:
+            index = CorpusIndex()
+        for game_key in self.gameKeys():
+            if game_key not in index:
+                index.addGame(game_key, self.eventSearch(game_key))
+
+        if snapshot_directory is not None and index.gamesIndexed() != loaded_games:
+            os.makedirs(snapshot_directory, exist_ok=True)
+            index.save(index_path)
+        self.index = index
+        return index
+
+def candidateGames(corpus: StatCorpus, plan: QueryPlan):
+    # returns the set of games that can match the plan according to the corpus index
+    # or None when every game has to be searched
+    inputs = plan.inputs
+    if corpus.index is None or 'batter' not in inputs:
+        return None
+
+    return corpus.index.matchupGames(inputs['batter'], inputs.get('pitcher'), inputs.get('fielder'))
+
+def eventMatch(corpus: StatCorpus, game_key, eventNum):
+    events_search = corpus.eventSearch(game_key)
+    game_stats = events_search.rioStat
+    event_obj = EventObj(game_stats, eventNum)
+    return EventMatch(game_key=game_key,
+                      event_num=eventNum,
+                      away_player=game_stats.player(0),
+                      home_player=game_stats.player(1),
+                      video_published=game_stats.statJson.get('Video Published'),
+                      game_date=corpus.gameDate(game_key),
+                      batter=event_obj.batter(),
+                      pitcher=event_obj.pitcher(),
+                      half_inning=event_obj.half_inning(),
+                      inning=event_obj.inning(),
+                      outs=event_obj.outs(),
+                      balls=event_obj.balls(),
+                      strikes=event_obj.strikes())
+
+def matchCursor(match: EventMatch):
+    # returns an opaque cursor, pass it as after= to resume a search past this match
+    return f'{match.game_key}:{match.event_num}'
+
+def parseCursor(cursor: str):
+    game_key, _, eventNum = cursor.rpartition(':')
+    if not game_key or not eventNum.isdigit():
+        raise Exception(f'Invalid cursor {cursor}')
+    return game_key, int(eventNum)
+
+def searchEvents(corpus: StatCorpus, spec, order_by='date', descending=False, limit=None, offset=0, after=None):
+    # returns a lazy iterator of EventMatch for every event in the corpus matching the spec
+    # spec is a filter dict or a QueryPlan from compileQuery, a dict is compiled once per search
+    # the spec, order and cursor are validated here, games are only searched
+    # and records only built as the iterator is consumed
+    # order_by 'date' scans games by start time and stops as soon as limit matches are found
+    # order_by 'event' orders by event number across every game so the whole corpus is scanned
+    # offset skips matches, after resumes past the match a cursor was taken from
+    # offset is ignored when after is given, as the cursor already marks the position
+    if order_by not in ORDER_BY:
+        raise Exception(f'Invalid order {order_by}. Accepted orders: {ORDER_BY}')
+    if offset < 0:
+        raise Exception(f'Invalid offset {offset}. Offset may not be negative.')
+    if after is not None:
+        offset = 0
+    plan = spec if isinstance(spec, QueryPlan) else compileQuery(spec)
+    after_event = None if after is None else parseCursor(after)
+
+    if limit is not None and limit <= 0:
+        return iter([])
+    return _matches(corpus, plan, order_by, descending, limit, offset, after_event)
+
+def _matches(corpus: StatCorpus, plan: QueryPlan, order_by, descending, limit, offset, after_event):
+    if order_by == 'date':
+        ordered = _eventsByDate(corpus, plan, descending, after_event)
+    else:
+        ordered = _eventsByEventNum(corpus, plan, descending, after_event, None if limit is None else offset + limit)
+
+    found = 0
+    for game_key, eventNum in ordered:
+        if offset > 0:
+            offset -= 1
+            continue
+        yield eventMatch(corpus, game_key, eventNum)
+        found += 1
+        if limit is not None and found >= limit:
+            return
+
+def _eventsByDate(corpus: StatCorpus, plan: QueryPlan, descending, after_event):
+    # games before the cursor are skipped without being loaded
+    after_key = None if after_event is None else (corpus.gameDate(after_event[0]), after_event[0])
+    candidate_games = candidateGames(corpus, plan)
+    for game_key in corpus.gameKeysByDate(descending):
+        if candidate_games is not None and game_key not in candidate_games:
+            continue
+        game_key_order = (corpus.gameDate(game_key), game_key)
+        if after_key is not None and (game_key_order < after_key if not descending else game_key_order > after_key):
+            continue
+        for eventNum in sorted(plan.matchingEvents(corpus.eventSearch(game_key)), reverse=descending):
+            if game_key_order == after_key and (eventNum <= after_event[1] if not descending else eventNum >= after_event[1]):
+                continue
+            yield game_key, eventNum
+
+def _eventsByEventNum(corpus: StatCorpus, plan: QueryPlan, descending, after_event, count):
+    # every game has to be searched, only the first count events are kept when a limit is set
+    key = lambda event: (event[1], corpus.gameDate(event[0]), event[0])
+    candidate_games = candidateGames(corpus, plan)
+    game_keys = corpus.gameKeys() if candidate_games is None else [game_key for game_key in corpus.gameKeys() if game_key in candidate_games]
+    events = ((game_key, eventNum) for game_key in game_keys for eventNum in plan.matchingEvents(corpus.eventSearch(game_key)))
+    if after_event is not None:
+        after_key = key(after_event)
+        events = (event for event in events if (key(event) < after_key if descending else key(event) > after_key))
+
+    if count is None:
+        return iter(sorted(events, key=key, reverse=descending))
+    if descending:
+        return iter(heapq.nlargest(count, events, key=key))
+    return iter(heapq.nsmallest(count, events, key=key))
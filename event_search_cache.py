@@ -0,0 +1,161 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+from collections import OrderedDict
+
+from project_rio_lib import stat_file_parser
+from project_rio_lib.stat_file_parser import StatObj
+import event_search_class
+from event_search_class import EventSearch
+
+# bump when the snapshot layout changes, snapshots are also invalidated
+# whenever the source of EventSearch or the stat file parser changes
+SNAPSHOT_FORMAT = 2
+
+def sourceVersion(modules, format_version):
+    # returns a short hash of the format version and the source of the modules
+    # so that anything pickled by older code is recognised as stale
+    source_hash = hashlib.sha1(str(format_version).encode())
+    for module in modules:
+        try:
+            source_hash.update(inspect.getsource(module).encode())
+        except (OSError, TypeError):
+            # source is unavailable, e.g. a compiled install, so fall back to the module file
+            with open(module.__file__, "rb") as module_file:
+                source_hash.update(module_file.read())
+    return source_hash.hexdigest()[:12]
+
+SNAPSHOT_VERSION = sourceVersion([event_search_class, stat_file_parser], SNAPSHOT_FORMAT)
+
+def estimateResidentSize(obj):
+    # returns the approximate memory used by obj and everything it references
+    # by walking its dicts, sets, lists, tuples and instance attributes
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, '__dict__') and not isinstance(current, type):
+            stack.append(current.__dict__)
+    return size
+
+class EventSearchCache():
+    # Bounded LRU cache of EventSearch objects keyed by game
+    # Each game is pickled to a snapshot the first time it is parsed so that
+    # evicted games can be reloaded without re-parsing the stat file.
+    # Resident size is estimated by walking the objects of each game once, when it
+    # is first parsed, and stored with its snapshot so reloads skip the walk.
+    # memory_budget is in bytes, None keeps every game resident
+    # snapshot_directory is required when a memory budget is set
+    def __init__(self, stat_files: dict, memory_budget=None, snapshot_directory=None):
+        if memory_budget is not None and snapshot_directory is None:
+            raise Exception('A snapshot directory is required when a memory budget is set')
+
+        self._stat_files: dict[str, str] = stat_files
+        self.memory_budget = memory_budget
+        self.snapshot_directory = snapshot_directory
+
+        self._resident: OrderedDict[str, EventSearch] = OrderedDict()
+        # sizes are kept after eviction as a game's size never changes
+        self._game_sizes: dict[str, int] = {}
+        self._resident_size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.snapshot_loads = 0
+
+    def __contains__(self, game_key):
+        return game_key in self._resident
+
+    def __len__(self):
+        return len(self._resident)
+
+    def residentSize(self):
+        return self._resident_size
+
+    def stats(self):
+        return {
+            'resident_games': len(self._resident),
+            'resident_size': self._resident_size,
+            'memory_budget': self.memory_budget,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'snapshot_loads': self.snapshot_loads
+            }
+
+    def get(self, game_key) -> EventSearch:
+        if game_key in self._resident:
+            self.hits += 1
+            self._resident.move_to_end(game_key)
+            return self._resident[game_key]
+
+        self.misses += 1
+        if game_key not in self._stat_files:
+            raise Exception(f'Unknown game {game_key}')
+
+        if self.memory_budget is None:
+            events_search = self.__parseStatFile(game_key)
+            self._game_sizes[game_key] = estimateResidentSize(events_search)
+        else:
+            events_search, self._game_sizes[game_key] = self.__loadSnapshot(game_key)
+
+        self._resident[game_key] = events_search
+        self._resident_size += self._game_sizes[game_key]
+        self.__evict()
+        return events_search
+
+    def clear(self):
+        self._resident.clear()
+        self._resident_size = 0
+
+    def __evict(self):
+        # drops least recently used games until the budget is met
+        # the most recent game is always kept so the caller can use it
+        if self.memory_budget is None:
+            return
+        while self._resident_size > self.memory_budget and len(self._resident) > 1:
+            game_key, _ = self._resident.popitem(last=False)
+            self._resident_size -= self._game_sizes[game_key]
+            self.evictions += 1
+
+    def __parseStatFile(self, game_key):
+        with open(self._stat_files[game_key], "r") as stats:
+            game_stats = StatObj(json.load(stats))
+        return EventSearch(game_stats)
+
+    def __snapshotPath(self, game_key):
+        # the version is part of the name so snapshots from older code are never loaded
+        return os.path.join(self.snapshot_directory, f'{game_key}.{SNAPSHOT_VERSION}.pickle')
+
+    def __loadSnapshot(self, game_key):
+        # returns the game and its resident size, loading from the snapshot
+        # unless it is missing or older than the stat file
+        snapshot_path = self.__snapshotPath(game_key)
+        if os.path.isfile(snapshot_path) and os.path.getmtime(snapshot_path) >= os.path.getmtime(self._stat_files[game_key]):
+            with open(snapshot_path, "rb") as snapshot:
+                size, events_search = pickle.load(snapshot)
+            self.snapshot_loads += 1
+            return events_search, size
+
+        events_search = self.__parseStatFile(game_key)
+        size = estimateResidentSize(events_search)
+        os.makedirs(self.snapshot_directory, exist_ok=True)
+        # written beside the final path then moved so a partial snapshot is never read
+        with open(f'{snapshot_path}.tmp', "wb") as snapshot:
+            pickle.dump((size, events_search), snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{snapshot_path}.tmp', snapshot_path)
+        return events_search, size
@@ -169,6 +169,10 @@ class EventSearch():
         if halfInningNum not in [0,1]:
             raise Exception(f'Invalid Half Inning num {halfInningNum}. Function only accepts base numbers of 0 or 1.')
 
+    def __errorCheck_outsNum(self, outsNum: int):
+        if abs(outsNum) not in [0,1,2]:
+            raise Exception(f'Invalid outs num {outsNum}. Function only accepts outs of -2 to 2.')
+
     def noneResultEvents(self):
         # returns a set of events who's result is none
         return self._result_of_AB_dict['None']
@@ -396,7 +400,7 @@ class EventSearch():
           return self._half_inning_dict[halfInningNum]
     
     def outsInInningEvents(self, outsNum: int):
-        self.__errorCheck_halfInningNum(outsNum)
+        self.__errorCheck_outsNum(outsNum)
         if outsNum >= 0:
             return self._outs_in_inning_dict[outsNum]
         else:
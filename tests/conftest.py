@@ -0,0 +1,32 @@
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAT_DIRECTORY = os.path.join(REPO_DIRECTORY, 'MattGreeRecordedGamesStats')
+
+# the modules live at the repo root and CharacterInputHandling reads CharNames.csv from the working directory
+sys.path.insert(0, REPO_DIRECTORY)
+os.chdir(REPO_DIRECTORY)
+
+def hasRioLib():
+    try:
+        return importlib.util.find_spec('project_rio_lib.stat_file_parser') is not None
+    except ModuleNotFoundError:
+        return False
+
+# project_rio_lib is a git submodule, skip every test when it has not been checked out
+collect_ignore_glob = [] if hasRioLib() else ['test_*.py']
+
+@pytest.fixture
+def stat_directory(tmp_path):
+    # a small copy of the bundled games so each test only parses a handful of them
+    directory = tmp_path / 'stats'
+    directory.mkdir()
+    stat_files = sorted(filename for filename in os.listdir(STAT_DIRECTORY) if 'decoded' in filename)
+    for filename in stat_files[:6]:
+        shutil.copy(os.path.join(STAT_DIRECTORY, filename), directory)
+    return str(directory)
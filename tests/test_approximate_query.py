@@ -0,0 +1,15 @@
+from approximate_query import _stratifiedTotal, sampleGames
+from event_query import StatCorpus
+
+def test_stratified_total_of_every_game_has_no_variance():
+    strata = {'2023-04': ['a', 'b', 'c'], '2023-05': ['d', 'e']}
+    values = {'2023-04': [1, 4, 2], '2023-05': [0, 5]}
+    total, variance = _stratifiedTotal(strata, values)
+    assert total == 12
+    assert variance == 0
+
+def test_sample_size_is_kept(stat_directory):
+    corpus = StatCorpus(stat_directory)
+    for sample_size in [2, 3, 5, len(corpus), len(corpus) + 10]:
+        strata, sample = sampleGames(corpus, sample_size, seed=1)
+        assert sum(len(games) for games in sample.values()) == min(sample_size, len(corpus))
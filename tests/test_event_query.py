@@ -0,0 +1,34 @@
+import pytest
+
+from event_query import StatCorpus, matchCursor, searchEvents
+
+SPEC = {'strikeout': True}
+
+def pages(corpus, order_by, descending, limit):
+    # follows the after cursor of each page until a page comes back short
+    matches = []
+    after = None
+    while True:
+        page = list(searchEvents(corpus, SPEC, order_by, descending, limit=limit, after=after))
+        matches.extend(page)
+        if len(page) < limit:
+            return matches
+        after = matchCursor(page[-1])
+
+@pytest.mark.parametrize('order_by', ['date', 'event'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_paging_matches_unlimited_scan(stat_directory, order_by, descending):
+    corpus = StatCorpus(stat_directory)
+    unlimited = list(searchEvents(corpus, SPEC, order_by, descending))
+    assert len(unlimited) > 7
+    assert pages(corpus, order_by, descending, limit=7) == unlimited
+
+def test_offset_matches_unlimited_scan(stat_directory):
+    corpus = StatCorpus(stat_directory)
+    unlimited = list(searchEvents(corpus, SPEC))
+    assert list(searchEvents(corpus, SPEC, limit=5, offset=3)) == unlimited[3:8]
+
+def test_negative_offset_raises(stat_directory):
+    corpus = StatCorpus(stat_directory)
+    with pytest.raises(Exception):
+        searchEvents(corpus, SPEC, offset=-1)
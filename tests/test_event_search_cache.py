@@ -0,0 +1,18 @@
+from event_filters import compileQuery
+from event_query import StatCorpus
+
+def test_tiny_budget_reloads_snapshots(stat_directory, tmp_path):
+    plan = compileQuery({'hit': True})
+    unbounded = StatCorpus(stat_directory)
+    expected = {game_key: plan.matchingEvents(unbounded.eventSearch(game_key)) for game_key in unbounded.gameKeys()}
+
+    # a budget of one byte keeps only the most recent game resident
+    corpus = StatCorpus(stat_directory, memory_budget=1, snapshot_directory=str(tmp_path / 'snapshots'))
+    for _ in range(2):
+        for game_key in corpus.gameKeys():
+            assert plan.matchingEvents(corpus.eventSearch(game_key)) == expected[game_key]
+
+    stats = corpus.cache.stats()
+    assert stats['resident_games'] == 1
+    assert stats['evictions'] > 0
+    assert stats['snapshot_loads'] == len(corpus)